@@ -2,10 +2,24 @@
 
 """Plot the output of signal_at_orf.py, after grouping by position and calculating the mean"""
 
+import numpy as np
 import pandas as pd
 import pylab as pl
 import sys
 
+def mean_signal_by_position(data):
+    """Average the signal at each position with np.bincount: the group key is
+    a small-range integer (1-1000), so two linear passes replace the
+    hash-based group discovery of a pandas groupby"""
+    positions = data['position'].to_numpy(np.int64)
+    signals = data['signal'].to_numpy(np.float64)
+
+    counts = np.bincount(positions)
+    sums = np.bincount(positions, weights=signals)
+
+    present = counts > 0
+    return np.nonzero(present)[0], sums[present] / counts[present]
+
 def main():
     print()
     print("---------------------------------------------------------")
@@ -16,15 +30,11 @@ def main():
     print()
 
     data_a = pd.read_csv(args.input_data_a, sep='\t')
-    grouped_a = data_a.groupby(['position'], as_index=False).mean()
-    xa = grouped_a['position']
-    ya = grouped_a['signal']
+    xa, ya = mean_signal_by_position(data_a)
 
     if args.input_data_b:
         data_b = pd.read_csv(args.input_data_b, sep='\t')
-        grouped_b = data_b.groupby(['position'], as_index=False).mean()
-        xb = grouped_b['position']
-        yb = grouped_b['signal']
+        xb, yb = mean_signal_by_position(data_b)
 
     print('Plotting...')
     print("---------------------------------------------------------")
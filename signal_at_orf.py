@@ -19,10 +19,127 @@ import os
 import time
 import pandas as pd
 import numpy as np
-from scipy.interpolate import InterpolatedUnivariateSpline
 from colorama import Fore, Back, Style, init as colinit
 colinit(autoreset=True)
 
+# Numba is optional: without it the kernel below falls back to np.interp,
+# which computes the exact same linear interpolation (just without the JIT)
+try:
+    from numba import njit, prange, types
+except ImportError:
+    njit = prange = types = None
+
+
+if njit is not None:
+    # Input arrays are marked read-only so the kernel accepts views straight
+    # out of pandas; the explicit signature makes Numba compile at import time
+    _f8_in = types.Array(types.float64, 1, 'C', readonly=True)
+
+    @njit(types.void(_f8_in, _f8_in, types.int64, types.int64,
+                     types.float64[::1]),
+          cache=True, fastmath=True)
+    def _norm_and_interp(positions, signals, start, full_leng, out_sig):
+        """
+        Normalize gene positions to a length of 1000 and linearly interpolate
+        the signal onto the integers 1 to 1000, written into out_sig.
+
+        Compiled with Numba; takes raw NumPy float64 arrays (positions must be
+        sorted in ascending order, as they are in the wiggle data).
+        """
+        n = positions.shape[0]
+        scale = 1000.0 / full_leng
+
+        # Rescale positions to the 1-1000 range
+        x = np.empty(n)
+        for i in range(n):
+            x[i] = (positions[i] - start + 1) * scale
+
+        # Two-pointer sweep: both x and the evaluation grid are monotonic, so
+        # the left neighbour index j only ever moves forward
+        j = 0
+        for i in range(1000):
+            xi = i + 1.0
+            while j < n - 1 and x[j + 1] < xi:
+                j += 1
+            if xi <= x[0]:
+                out_sig[i] = signals[0]
+            elif xi >= x[n - 1]:
+                out_sig[i] = signals[n - 1]
+            else:
+                t = (xi - x[j]) / (x[j + 1] - x[j])
+                out_sig[i] = signals[j] + t * (signals[j + 1] - signals[j])
+
+    @njit(parallel=True, cache=True, fastmath=True)
+    def _collect_strand(positions, signals, starts, ends):
+        """
+        Fused kernel for one chromosome strand: for every gene, locate its
+        flank-extended range with a binary search, check for discontinuities,
+        and normalize + interpolate the signal into one row of a preallocated
+        (n_genes, 1000) output array. Genes are independent, so the loop runs
+        in parallel across threads. Returns the output array and a boolean
+        mask of the genes that were not skipped.
+        """
+        n_genes = starts.shape[0]
+        out = np.empty((n_genes, 1000))
+        valid = np.zeros(n_genes, dtype=np.bool_)
+
+        for g in prange(n_genes):
+            start = starts[g]
+            end = ends[g]
+            full_leng = (end - start) + 1
+
+            lo = np.searchsorted(positions, start, side='left')
+            hi = np.searchsorted(positions, end, side='right')
+
+            # Skip genes with coordinates missing from the ChIPseq data or
+            # discontinuities in it (missing position:value pairs)
+            if hi - lo != full_leng:
+                continue
+
+            _norm_and_interp(positions[lo:hi], signals[lo:hi], start,
+                             full_leng, out[g])
+            valid[g] = True
+
+        return out, valid
+else:
+    def _norm_and_interp(positions, signals, start, full_leng, out_sig):
+        """
+        Pure-NumPy version of the kernel above, used when Numba is not
+        installed: normalize gene positions to a length of 1000 and linearly
+        interpolate the signal onto the integers 1 to 1000 with np.interp.
+        """
+        x = (positions - start + 1.0) * (1000.0 / full_leng)
+        out_sig[:] = np.interp(np.arange(1.0, 1001.0), x, signals)
+
+    def _collect_strand(positions, signals, starts, ends):
+        """
+        Pure-NumPy version of the fused kernel above, used when Numba is not
+        installed: same per-gene range lookup, discontinuity check and
+        normalize + interpolate steps, looping over genes in Python.
+        """
+        n_genes = starts.shape[0]
+        out = np.empty((n_genes, 1000))
+        valid = np.zeros(n_genes, dtype=np.bool_)
+
+        for g in range(n_genes):
+            start = starts[g]
+            end = ends[g]
+            full_leng = (end - start) + 1
+
+            lo = np.searchsorted(positions, start, side='left')
+            hi = np.searchsorted(positions, end, side='right')
+
+            # Skip genes with coordinates missing from the ChIPseq data or
+            # discontinuities in it (missing position:value pairs)
+            if hi - lo != full_leng:
+                continue
+
+            _norm_and_interp(positions[lo:hi], signals[lo:hi], start,
+                             full_leng, out[g])
+            valid[g] = True
+
+        return out, valid
+
 
 def signal_at_orf(wiggle, wiggle_folder, gff, save_file=True):
     """
@@ -37,8 +154,8 @@ def signal_at_orf(wiggle, wiggle_folder, gff, save_file=True):
     Both gene lengths will then be scaled to 500 and all four flanking regions to
     250.
 
-    After scaling, fits a spline function passing through all signal points and uses
-    it to output values of the signal at each integer position between 1 and 1000.
+    After scaling, linearly interpolates the signal between the scaled positions and
+    uses it to output values of the signal at each integer position between 1 and 1000.
 
     Keyword arguments
     =================
@@ -59,7 +176,7 @@ def signal_at_orf(wiggle, wiggle_folder, gff, save_file=True):
             - gene: Systematic gene name
     """
 
-    t0 = time.time()
+    t0 = time.perf_counter()
 
     # Check reference genome
     gff_gen = helpers.check_genome(gff.ix[0, 'seqname'])
@@ -81,147 +198,115 @@ def signal_at_orf(wiggle, wiggle_folder, gff, save_file=True):
     print('Collecting signal...')
     print('(Skip genes with missing coordinates and signal in wiggle data)')
 
-    # Create dfs to collect final data for all chrs
-    plus_final = pd.DataFrame()
-    minus_final = pd.DataFrame()
+    # Collect raw per-strand arrays (chr name, gene names, 2D signal) in
+    # lists; the final table is assembled from them in one shot at the end
+    plus_final = []
+    minus_final = []
 
     # Keep track of total and non-skipped genes
     number_genes = 0
     number_skipped_genes = 0
 
+    # Constant evaluation grid (the same for every gene)
+    new_positions = np.arange(1, 1001)
+
+    # Group the gff once by chromosome and strand, instead of re-scanning all
+    # of it with two boolean masks for every chromosome x strand combination
+    gff_groups = {key: group for key, group in
+                  gff.groupby(['seqname', 'strand'], sort=False)}
+    empty_gff = gff.iloc[0:0]
+
     # Loop through chrs
     for chrNum, chromData in wiggle.items():
         print(Style.BRIGHT + chrNum + ':')
-        # -------------------------------------- Plus strand ------------------------------------- #
-        # Create data frame to collect final data for all genes in chr strand
-        plus_strand = pd.DataFrame()
-
-        # Get all genes on "+" strand of current chromosome
-        chrgff = gff.loc[(gff['seqname'] == chrNum) & (gff['strand'] == '+')]
 
-        gene_count = 0
-
-        # Loop through rows (use itertuples, it's faster than iterrows)
-        for row in chrgff.itertuples():
-            # Skip if gene coordinates not in ChIPseq data
-            if (row.start not in chromData.loc[:, 'position'] or
-                        row.end not in chromData.loc[:, 'position']):
-                continue
+        # Structure-of-arrays view of the chromosome: two contiguous NumPy
+        # arrays support binary-search range extraction (positions in wiggle
+        # data are sorted) and feed the compiled kernel without any pandas
+        # slicing overhead in the gene loop
+        pos_f8 = chromData['position'].to_numpy(np.float64)
+        sig_f8 = chromData['signal'].to_numpy(np.float64)
+
+        # The kernel's binary searches require sorted positions; wiggle files
+        # are written in order, but sort once here if this one is not
+        if np.any(np.diff(pos_f8) < 0):
+            order = np.argsort(pos_f8, kind='stable')
+            pos_f8 = pos_f8[order]
+            sig_f8 = sig_f8[order]
+
+        # Process both strands with the fused per-strand kernel: genes are
+        # independent, so each strand is handled as one batch of flank-extended
+        # ranges normalized + interpolated into a preallocated 2D array
+        for strand, final_chunks in (('+', plus_final), ('-', minus_final)):
+            # Get all genes on current strand of current chromosome
+            chrgff = gff_groups.get((chrNum, strand), empty_gff)
 
             # Collect flanking regions scaled according to ratio gene length / 1 kb
-            gene_leng = row.end - row.start
-            start = row.start - (gene_leng // 2)
-            end = row.end + (gene_leng // 2)
-            full_leng = (end - start) + 1
-            gene = row.attribute
-
-            # Pull out signal
-            gene_data = chromData.loc[(chromData['position'] >= start) & (chromData['position'] <= end)]
-
-            # Skip if there are discontinuities in the data (missing position:value pairs)
-            if gene_data.shape[0] != full_leng:
-                continue
-
-            # Normalize to segment length of 1000
-            pd.options.mode.chained_assignment = None  # Disable warning about chained assignment
-            gene_data['position'] = gene_data['position'] - start + 1
-            gene_data['position'] = gene_data['position'] * (1000 / full_leng)
+            gene_start = chrgff['start'].to_numpy(np.int64)
+            gene_end = chrgff['end'].to_numpy(np.int64)
+            gene_leng = gene_end - gene_start
+            starts = gene_start - gene_leng // 2
+            ends = gene_end + gene_leng // 2
 
             # Genes of different sizes have different numbers of positions; small genes
             # (<1000bp) cannot produce signal values for all 1000 positions and will have gaps
             # This means that longer genes with more signal values per each position in the
             # sequence of 1000 positions will contribute more to the final output.
-            # In order to avoid this, first build an interpolation model of the signal and then
-            # use it to project the signal onto the first 1000 integers
-            f = InterpolatedUnivariateSpline(gene_data['position'], gene_data['signal'])
-            new_positions = np.int_(np.linspace(1, 1000, num=1000, endpoint=True))
-            new_signals = f(new_positions)
-
-            # Make data frame for this gene
-            gene_data = pd.DataFrame({'chr': chrNum, 'position': new_positions, 'signal': new_signals, 'gene': gene})
-
-            # To collect all genes
-            plus_strand = plus_strand.append(gene_data)
-
-            gene_count += 1
-
-
-        print('... + strand: {0} genes (skipped {1})'.format(gene_count,
-                                                             chrgff.shape[0] - gene_count))
-
-        # Keep track of total and non-skipped genes, to print info at the end
-        number_genes += chrgff.shape[0]
-        number_skipped_genes += chrgff.shape[0] - gene_count
-
-        # To collect all chrs
-        plus_final = plus_final.append(plus_strand)
-
-        # ------------------------------------- Minus strand ------------------------------------- #
-        # Create data frame to collect final data for all genes in chr strand
-        minus_strand = pd.DataFrame()
-
-        # Get all genes on "+" strand of current chromosome
-        chrgff = gff.loc[(gff['seqname'] == chrNum) & (gff['strand'] == '-')]
-
-        gene_count = 0
-
-        # Loop through rows (use itertuples because it's faster than iterrows)
-        for row in chrgff.itertuples():
-            # Skip if gene coordinates not in ChIPseq data
-            if (row.start not in chromData.loc[:, 'position'] or
-                    row.end not in chromData.loc[:, 'position']):
-                continue
-
-            # Collect flanking regions scaled according to ratio gene length / 1 kb
-            gene_leng = row.end - row.start
-            start = row.start - (gene_leng // 2)
-            end = row.end + (gene_leng // 2)
-            full_leng = (end - start) + 1
-            gene = row.attribute
-
-            # Pull out signal
-            gene_data = chromData.loc[(chromData['position'] >= start) & (chromData['position'] <= end)]
-
-            # Skip if there are discontinuities in the data (missing position:value pairs)
-            if gene_data.shape[0] != full_leng:
-                continue
-
-            # Normalize to segment length of 1000
-            pd.options.mode.chained_assignment = None  # Disable warning about chained assignment
-            gene_data['position'] = gene_data['position'] - start + 1
-            gene_data['position'] = gene_data['position'] * (1000 / full_leng)
-
-            f = InterpolatedUnivariateSpline(gene_data['position'], gene_data['signal'])
-            new_positions = np.int_(np.linspace(1, 1000, num=1000, endpoint=True))
-            new_signals = f(new_positions)
-
-            # Reverse the order of the position values (to join with Watson strand)
-            new_positions = (1000 - new_positions) + 1
-
-            # Make data frame for this gene
-            gene_data = pd.DataFrame({'chr': chrNum,
-                                      'position': new_positions,
-                                      'signal': new_signals,
-                                      'gene': gene})
-
-            # To collect all genes
-            minus_strand = minus_strand.append(gene_data)
-
-            gene_count += 1
-
-
-        print('... - strand: {0} genes (skipped {1})'.format(gene_count,
-                                                             chrgff.shape[0] - gene_count))
-
-        # Keep track of total and non-skipped genes, to print info at the end
-        number_genes += chrgff.shape[0]
-        number_skipped_genes += chrgff.shape[0] - gene_count
-
-        # To collect all chrs
-        minus_final = minus_final.append(minus_strand)
-
-    # Merge '+' and '-' strand data
-    merged_strands = plus_final.append(minus_final)
+            # In order to avoid this, normalize each gene to a segment length of 1000,
+            # interpolate the signal and project it onto the first 1000 integers
+            # (all done per gene, in parallel, by the fused kernel)
+            signals_2d, valid = _collect_strand(pos_f8, sig_f8, starts, ends)
+
+            gene_count = int(valid.sum())
+
+            if gene_count:
+                signals_2d = signals_2d[valid]
+
+                # Reverse the order of the Crick strand signal values (to join
+                # with the Watson strand), keeping the shared ascending grid
+                if strand == '-':
+                    signals_2d = signals_2d[:, ::-1]
+
+                # Keep the raw arrays for all kept genes in chr strand
+                genes = chrgff['attribute'].to_numpy()[valid]
+                final_chunks.append((chrNum, genes, signals_2d))
+
+            print('... {0} strand: {1} genes (skipped {2})'.format(
+                strand, gene_count, chrgff.shape[0] - gene_count))
+
+            # Keep track of total and non-skipped genes, to print info at the end
+            number_genes += chrgff.shape[0]
+            number_skipped_genes += chrgff.shape[0] - gene_count
+
+    # Merge '+' and '-' strand data into one table, slice-assigning the
+    # collected arrays into preallocated column buffers: a handful of
+    # allocations in total instead of one data frame per chromosome strand
+    all_chunks = plus_final + minus_final
+    gene_names = np.concatenate([genes for _, genes, _ in all_chunks])
+    chr_per_gene = np.concatenate([np.full(genes.shape[0], chrName)
+                                   for chrName, genes, _ in all_chunks])
+    total_kept = gene_names.shape[0]
+
+    signal_col = np.empty(total_kept * 1000)
+    kept = 0
+    for _, _, signals_2d in all_chunks:
+        n_kept = signals_2d.shape[0]
+        signal_col[kept * 1000:(kept + n_kept) * 1000].reshape(
+            n_kept, 1000)[:] = signals_2d
+        kept += n_kept
+
+    # Encode the repeating chr and gene columns as categoricals built straight
+    # from integer codes: one small code per row plus a name dictionary,
+    # instead of a Python string object per row (np.unique returns the
+    # categories sorted, so sorting on them below stays lexicographic)
+    chr_cats, chr_codes = np.unique(chr_per_gene, return_inverse=True)
+    gene_cats, gene_codes = np.unique(gene_names, return_inverse=True)
+
+    merged_strands = pd.DataFrame(
+        {'chr': pd.Categorical.from_codes(np.repeat(chr_codes, 1000), chr_cats),
+         'position': np.tile(new_positions, total_kept),
+         'signal': signal_col,
+         'gene': pd.Categorical.from_codes(np.repeat(gene_codes, 1000), gene_cats)})
 
     # Sort by gene and position
     merged_strands = merged_strands.sort_values(['gene', 'position'])